@@ -1,4 +1,10 @@
+import asyncio
+import concurrent.futures
+import csv
 import datetime
+import inspect
+import io
+import itertools
 import re
 import weakref
 from .functions import Functions
@@ -40,6 +46,33 @@ def get_coordinates_by_name(name):
     col, row = re.findall(r"([A-Z]+)([0-9]+)", name)[0]
     return slice(get_column_by_name(col), int(row)-1)
 
+def get_bounds_by_name(name):
+    """
+    Gives the bounds of a range
+    :param name: range with the form A1, A1:B2, A:B or 1:2
+    :return: tuple with first column, first row, last column and last row. None where unbounded
+    """
+    name = name.upper()
+    bounds = list()
+    for part in (name.split(":")+[name])[:2]:
+        col, row = re.findall(r"^([A-Z]*)([0-9]*)$", part)[0]
+        bounds.append((get_column_by_name(col) if col != "" else None, int(row)-1 if row != "" else None))
+    (first_col, first_row), (last_col, last_row) = bounds
+    return first_col, first_row, last_col, last_row
+
+def in_bounds(bounds, coordinates):
+    """
+    Checks whether coordinates are in bounds
+    :param bounds: tuple as given by get_bounds_by_name. None for the whole spreadsheet
+    :param coordinates: slice with the form [column:row]
+    :return: bool
+    """
+    if bounds is None:
+        return True
+    first_col, first_row, last_col, last_row = bounds
+    return (first_col is None or first_col <= coordinates.start <= last_col) and \
+           (first_row is None or first_row <= coordinates.stop <= last_row)
+
 class _Relatives:
     pass
 
@@ -111,6 +144,68 @@ RelativeCells = _Relative.Cells()
 Relativecolumns = _Relative.Columns()
 RelativeRows = _Relative.Rows()
 
+SYLK_HEAD = ["ID;P;N;E",
+             "P;PGeneral",
+             "F;P0;DG0G10;M300",
+             "P;P0",
+             "P;P0.00",
+             "P;P#,##0",
+             "P;P#,##0.00",
+             "P;P#,##0\ _(0;;\-#,##0\ _(0",
+             "P;P#,##0\ _(0;;[Red]\-#,##0\ _(0",
+             "P;P#,##0.00\ _(0;;\-#,##0.00\ _(0",
+             "P;P#,##0.00\ _(0;;[Red]\-#,##0.00\ _(0",
+             "P;P#,##0\ \"$\";;\-#,##0\ \"$\"",
+             "P;P#,##0\ \"$\";;[Red]\-#,##0\ \"$\"",
+             "P;P#,##0.00\ \"$\";;\-#,##0.00\ \"$\"",
+             "P;P#,##0.00\ \"$\";;[Red]\-#,##0.00\ \"$\"",
+             "P;P0%",
+             "P;P0.00%",
+             "P;P0.00E+00",
+             "P;P##0.0E+0",
+             "P;P#\ ?/?",
+             "P;P#\ ??/??",
+             "P;Pdd/mm/yyyy",
+             "P;Pdd\-mmm\-yy",
+             "P;Pdd\-mmm",
+             "P;Pmmm\-yy",
+             "P;Ph:mm\ AM/PM",
+             "P;Ph:mm:ss\ AM/PM",
+             "P;Ph:mm",
+             "P;Ph:mm:ss",
+             "P;Pdd/mm/yyyy\ h:mm",
+             "P;Pmm:ss",
+             "P;Pmm:ss.0",
+             "P;P@",
+             "P;P[h]:mm:ss",
+             "P;P_-* #,##0\ \"$\"_-;;\-* #,##0\ \"$\"_-;;_-* \"-\"\ \"$\"_-;;_-@_-",
+             "P;P_-* #,##0\ _(0_-;;\-* #,##0\ _(0_-;;_-* \"-\"\ _(0_-;;_-@_-",
+             "P;P_-* #,##0.00\ \"$\"_-;;\-* #,##0.00\ \"$\"_-;;_-* \"-\"??\ \"$\"_-;;_-@_-",
+             "P;P_-* #,##0.00\ _(0_-;;\-* #,##0.00\ _(0_-;;_-* \"-\"??\ _(0_-;;_-@_-",
+             "P;FCalibri;M220;L9",
+             "P;FCalibri;M220;L9",
+             "P;FCalibri;M220;L9",
+             "P;FCalibri;M220;L9",
+             "P;ECalibri;M220;L9",
+             "P;ECambria;M360;SB;L57",
+             "P;ECalibri;M300;SB;L57",
+             "P;ECalibri;M260;SB;L57",
+             "P;ECalibri;M220;SB;L57",
+             "P;ECalibri;M220;L18",
+             "P;ECalibri;M220;L21",
+             "P;ECalibri;M220;L61",
+             "P;ECalibri;M220;L63",
+             "P;ECalibri;M220;SB;L64",
+             "P;ECalibri;M220;SB;L53",
+             "P;ECalibri;M220;L53",
+             "P;ECalibri;M220;SB;L10",
+             "P;ECalibri;M220;L11",
+             "P;ECalibri;M220;SI;L24",
+             "P;ECalibri;M220;SB;L9",
+             "P;ECalibri;M220;L10",
+             "O;L;D;V0;K47;G100 0.001"
+             ]
+
 class Range(list):
     def __init__(self, data, *, start, stop):
         list.__init__(self, data)
@@ -121,21 +216,226 @@ class Range(list):
         return ":".join(["R{}C{}".format(i.stop+1, i.start+1)
                          for i in (self._start, self._stop)])
 
+class Workbook:
+    """
+    Container of spreadsheets, which get a stable id when added
+    """
+    def __init__(self, *, _weak=False):
+        self._ids = itertools.count()
+        if _weak: #Spreadsheets in the default workbook live only as long as they are used
+            self._sheets = weakref.WeakValueDictionary()
+            self._names = weakref.WeakValueDictionary()
+        else:
+            self._sheets = dict()
+            self._names = dict()
+        self._dependents = dict() #id of sheet: {id of dependent cell: (weakref to cell, list of bounds)}
+
+    def __getitem__(self, item):
+        """
+        Gets a spreadsheet by its name, regardless of case
+        :param item: name of the spreadsheet
+        :return: Spreadsheet
+        """
+        return self._names[str(item).lower()]
+
+    def __contains__(self, item):
+        try:
+            self[item]
+        except KeyError:
+            return False
+        else:
+            return True
+
+    def __iter__(self):
+        return iter([sheet for id, sheet in sorted(self._sheets.items(), key=lambda x: x[0])])
+
+    def __len__(self):
+        return len(self._sheets)
+
+    def by_id(self, id):
+        """
+        Gets a spreadsheet by its id
+        :param id: id of the spreadsheet
+        :return: Spreadsheet
+        """
+        return self._sheets[id]
+
+    def add(self, data=None, *, name=None):
+        """
+        Creates a new spreadsheet in the workbook
+        :param data: rows to fill the spreadsheet with
+        :param name: name of the spreadsheet, unique regardless of case. Defaults to its id
+        :return: Spreadsheet
+        """
+        return Spreadsheet(data, name=name, workbook=self)
+
+    def remove(self, spreadsheet):
+        """
+        Takes a spreadsheet out of the workbook. Formulas already referencing it keep on doing so
+        :param spreadsheet: Spreadsheet to remove
+        :return: None
+        """
+        if self._sheets.get(spreadsheet.id) is not spreadsheet:
+            raise ValueError("spreadsheet is not in this workbook")
+        del self._sheets[spreadsheet.id]
+        if self._names.get(str(spreadsheet.name).lower()) is spreadsheet:
+            del self._names[str(spreadsheet.name).lower()]
+
+    def _register(self, spreadsheet):
+        if spreadsheet.name is not None and str(spreadsheet.name).lower() in self._names:
+            raise ValueError("there is already a spreadsheet named {}".format(spreadsheet.name))
+        id = next(self._ids)
+        if spreadsheet.name is None:
+            while str(id) in self._names:
+                id = next(self._ids)
+            spreadsheet._name = str(id)
+        spreadsheet._id = id
+        self._sheets[id] = spreadsheet
+        self._names[str(spreadsheet.name).lower()] = spreadsheet
+        weakref.finalize(spreadsheet, self._dependents.pop, id, None)
+        return id
+
+    def _rename(self, spreadsheet, name):
+        if self._sheets.get(spreadsheet.id) is not spreadsheet: #Removed from the workbook
+            return
+        if self._names.get(str(name).lower(), spreadsheet) is not spreadsheet:
+            raise ValueError("there is already a spreadsheet named {}".format(name))
+        if self._names.get(str(spreadsheet.name).lower()) is spreadsheet:
+            del self._names[str(spreadsheet.name).lower()]
+        self._names[str(name).lower()] = spreadsheet
+
+    def _depend(self, cell):
+        """
+        Registers the references of the value of cell, forgetting those of its former value
+        :param cell: Cell just set
+        :return: None
+        """
+        key = id(cell)
+        for dependents in self._dependents.values():
+            dependents.pop(key, None)
+        value = object.__getattribute__(cell, "_value")
+        if isinstance(value, _RelativeCell):
+            references = [(cell.spreadsheet, None)] #It moves along with cell, so it may be anywhere
+        elif isinstance(value, dict) and "function" in value:
+            references = value["function"].references
+        else:
+            references = list()
+        for spreadsheet, bounds in references:
+            if spreadsheet.id is not None and spreadsheet.workbook is self:
+                dependents = self._dependents.setdefault(spreadsheet.id, dict())
+                dependents.setdefault(key, (weakref.ref(cell), list()))[1].append(bounds)
+
+    def _invalidate(self, spreadsheet, coordinates):
+        """
+        Discards the calculated values of the cells depending on a change, and of those depending on them
+        :param spreadsheet: Spreadsheet changed
+        :param coordinates: slice with the form [column:row] of the cell changed. None if it may be any
+        :return: None
+        """
+        pending = [(spreadsheet, coordinates)]
+        invalidated = set()
+        while len(pending) > 0:
+            spreadsheet, coordinates = pending.pop()
+            dependents = self._dependents.get(spreadsheet.id, dict())
+            for key, (reference, bounds) in list(dependents.items()):
+                cell = reference()
+                if cell is None:
+                    del dependents[key]
+                elif key not in invalidated and \
+                        (coordinates is None or any([in_bounds(item, coordinates) for item in bounds])):
+                    invalidated.add(key)
+                    dependent = cell.spreadsheet
+                    dependent._generation += 1
+                    dependent._discard(key)
+                    try:
+                        pending.append((dependent, cell.coordinates))
+                    except IndexError: #It is not in its spreadsheet anymore
+                        del dependents[key]
+
+def _calculate_rows(rows, offset):
+    calculated = dict()
+    for row in rows:
+        for cell in row:
+            if isinstance(object.__getattribute__(cell, "_value"), (_RelativeCell, dict)):
+                calculated[id(cell)] = (cell, cell.value)
+    return calculated
+
+def _snapshot(cell):
+    value = object.__getattribute__(cell, "_value")
+    if isinstance(value, dict) and "function" in value:
+        return dict(value, calculated=cell.value)
+    return value
+
+def _sylk_rows(rows, offset):
+    return "".join(["\r\n".join([sylk_cell(value, slice(column, offset+index))
+                                  for column, value in enumerate(row)])+"\r\n"
+                    for index, row in enumerate(rows)])
+
+def _csv_value(value):
+    if value == "":
+        return None
+    elif re.fullmatch(r"-?(0|[1-9][0-9]*)", value): #Leading zeros, as in codes, are kept as text
+        return int(value)
+    elif re.fullmatch(r"-?[0-9]+\.[0-9]*(e[+-]?[0-9]+)?", value, re.IGNORECASE):
+        return float(value)
+    return value
+
+def _check_executor(executor):
+    if executor is not None and not isinstance(executor, concurrent.futures.ThreadPoolExecutor):
+        raise TypeError("only thread executors are supported, as cells cannot be sent to other processes")
+
+async def _amap(function, rows, chunk_size, executor):
+    _check_executor(executor)
+    loop = asyncio.get_running_loop()
+    final = list()
+    for offset in range(0, len(rows), chunk_size):
+        chunk = rows[offset:offset+chunk_size]
+        if executor is None:
+            final.append(function(chunk, offset))
+        else:
+            final.append(await loop.run_in_executor(executor, function, chunk, offset))
+        await asyncio.sleep(0)
+    return final
+
+async def _alines(stream):
+    if hasattr(stream, "__aiter__"):
+        async for line in stream:
+            yield line
+    else:
+        for line in stream:
+            yield line
+
+async def _awrite(stream, data, encoding=None):
+    if encoding is not None:
+        data = data.encode(encoding)
+    written = stream.write(data)
+    if inspect.isawaitable(written):
+        await written
+    if hasattr(stream, "drain"):
+        await stream.drain()
+
 class Spreadsheet(list):
     """
     Spreadsheetclass to form Excel spreadsheets 12 in Sylk format
     """
     functions = dict()
-    sheets = weakref.WeakValueDictionary()
-    def __init__(self, data=None, *, name=None):
+    sheets = Workbook(_weak=True) #Default workbook
+    retries = 3 #Times asynchronous calculations go again over the values discarded by edits meanwhile
+    def __init__(self, data=None, *, name=None, workbook=None, _register=True):
         list.__init__(self)
-        if name is None:
-            self.name = str(len(Spreadsheet.sheets))
-        else:
-            self.name = name
-        Spreadsheet.sheets[self.name] = self
+        self._calculated = None
+        self._calculating = None #Values being calculated asynchronously
+        self._generation = 0 #Increased on every edit, so calculated values know when they are outdated
+        self._lock = (None, None) #Event loop and its lock
+        self._loading = True
+        self._id = None
+        self._name = name
+        self._workbook = Spreadsheet.sheets if workbook is None else workbook
+        if _register: #Slices of other spreadsheets are not registered
+            self._workbook._register(self)
         if data is not None:
             self.extend(data)
+        self._loading = False
 
     def __getitem__(self, item):
         """
@@ -161,75 +461,25 @@ class Spreadsheet(list):
         elif isinstance(key, str):
             coord = get_coordinates_by_name(key)
             self[coord.stop][coord.start] = item
+        elif isinstance(key, int):
+            if isinstance(item, Rows) and item.spreadsheet is self: #As in spreadsheet[0] += [...]
+                list.__setitem__(self, key, item)
+                self._touch()
+            else:
+                row = Rows(self)
+                list.__setitem__(self, key, row)
+                self._touch()
+                if not isinstance(item, (list, tuple)):
+                    item = [item]
+                row.extend(item)
 
     def __copy__(self):
         #TODO
         pass
 
     def __sylk__(self):
-        head = ["ID;P;N;E",
-                "P;PGeneral",
-                "F;P0;DG0G10;M300",
-                "P;P0",
-                "P;P0.00",
-                "P;P#,##0",
-                "P;P#,##0.00",
-                "P;P#,##0\ _(0;;\-#,##0\ _(0",
-                "P;P#,##0\ _(0;;[Red]\-#,##0\ _(0",
-                "P;P#,##0.00\ _(0;;\-#,##0.00\ _(0",
-                "P;P#,##0.00\ _(0;;[Red]\-#,##0.00\ _(0",
-                "P;P#,##0\ \"$\";;\-#,##0\ \"$\"",
-                "P;P#,##0\ \"$\";;[Red]\-#,##0\ \"$\"",
-                "P;P#,##0.00\ \"$\";;\-#,##0.00\ \"$\"",
-                "P;P#,##0.00\ \"$\";;[Red]\-#,##0.00\ \"$\"",
-                "P;P0%",
-                "P;P0.00%",
-                "P;P0.00E+00",
-                "P;P##0.0E+0",
-                "P;P#\ ?/?",
-                "P;P#\ ??/??",
-                "P;Pdd/mm/yyyy",
-                "P;Pdd\-mmm\-yy",
-                "P;Pdd\-mmm",
-                "P;Pmmm\-yy",
-                "P;Ph:mm\ AM/PM",
-                "P;Ph:mm:ss\ AM/PM",
-                "P;Ph:mm",
-                "P;Ph:mm:ss",
-                "P;Pdd/mm/yyyy\ h:mm",
-                "P;Pmm:ss",
-                "P;Pmm:ss.0",
-                "P;P@",
-                "P;P[h]:mm:ss",
-                "P;P_-* #,##0\ \"$\"_-;;\-* #,##0\ \"$\"_-;;_-* \"-\"\ \"$\"_-;;_-@_-",
-                "P;P_-* #,##0\ _(0_-;;\-* #,##0\ _(0_-;;_-* \"-\"\ _(0_-;;_-@_-",
-                "P;P_-* #,##0.00\ \"$\"_-;;\-* #,##0.00\ \"$\"_-;;_-* \"-\"??\ \"$\"_-;;_-@_-",
-                "P;P_-* #,##0.00\ _(0_-;;\-* #,##0.00\ _(0_-;;_-* \"-\"??\ _(0_-;;_-@_-",
-                "P;FCalibri;M220;L9",
-                "P;FCalibri;M220;L9",
-                "P;FCalibri;M220;L9",
-                "P;FCalibri;M220;L9",
-                "P;ECalibri;M220;L9",
-                "P;ECambria;M360;SB;L57",
-                "P;ECalibri;M300;SB;L57",
-                "P;ECalibri;M260;SB;L57",
-                "P;ECalibri;M220;SB;L57",
-                "P;ECalibri;M220;L18",
-                "P;ECalibri;M220;L21",
-                "P;ECalibri;M220;L61",
-                "P;ECalibri;M220;L63",
-                "P;ECalibri;M220;SB;L64",
-                "P;ECalibri;M220;SB;L53",
-                "P;ECalibri;M220;L53",
-                "P;ECalibri;M220;SB;L10",
-                "P;ECalibri;M220;L11",
-                "P;ECalibri;M220;SI;L24",
-                "P;ECalibri;M220;SB;L9",
-                "P;ECalibri;M220;L10",
-                "O;L;D;V0;K47;G100 0.001"
-                ]
         foot = ["E"]
-        return "\r\n".join(head+[sylk(item) for item in self]+foot)+"\r\n"
+        return "\r\n".join(SYLK_HEAD+[sylk(item) for item in self]+foot)+"\r\n"
 
     @property
     def Columns(self):
@@ -252,7 +502,7 @@ class Spreadsheet(list):
                                 row[x] = None
                             this.append(row[x])
                         final.append(this)
-                    return Columns(self.spreadsheet, final)
+                    return Columns(self.spreadsheet, final, workbook=self.spreadsheet.workbook, _register=False)
                 else:
                     raise CoordinatesError("Coordinates may be slices with the form [first column:last column]")
         return ColumnsGenerator(self)
@@ -268,7 +518,7 @@ class Spreadsheet(list):
                 if isinstance(coordinates, slice):
                     for x in range(coordinates.start, coordinates.stop+1):
                         final.append(self.spreadsheet[x])
-                    return Spreadsheet(final)
+                    return Spreadsheet(final, workbook=self.spreadsheet.workbook, _register=False)
                 else:
                     raise CoordinatesError("Coordinates may be slices with the form [first row:last row]")
         return RowsGenerator(self)
@@ -279,9 +529,19 @@ class Spreadsheet(list):
 
     @name.setter
     def name(self, value):
+        if self._id is not None:
+            self.workbook._rename(self, value)
         self._name = value
         #self.__xmlspreadsheet__
 
+    @property
+    def id(self):
+        return self._id
+
+    @property
+    def workbook(self):
+        return self._workbook
+
     def append(self, item):
         """
         Appends only Rows to Spreadsheet
@@ -303,6 +563,44 @@ class Spreadsheet(list):
         for item in items:
             self.append(item)
 
+    def __delitem__(self, key):
+        list.__delitem__(self, key)
+        self._touch()
+
+    def clear(self):
+        list.clear(self)
+        self._touch()
+
+    def insert(self, index, item):
+        list.insert(self, index, item)
+        self._touch()
+
+    def pop(self, index=-1):
+        item = list.pop(self, index)
+        self._touch()
+        return item
+
+    def remove(self, item):
+        list.remove(self, item)
+        self._touch()
+
+    def reverse(self):
+        list.reverse(self)
+        self._touch()
+
+    def sort(self, *, key=None, reverse=False):
+        list.sort(self, key=key, reverse=reverse)
+        self._touch()
+
+    def __iadd__(self, items):
+        self.extend(items)
+        return self
+
+    def __imul__(self, times):
+        list.__imul__(self, times)
+        self._touch()
+        return self
+
     def subslice(self, start, stop): #REDO
         final = list()
         for row_index in range(start.stop, stop.stop+1):
@@ -343,6 +641,166 @@ class Spreadsheet(list):
     def to_sylk(self):
         pass
 
+    def _touch(self, cell=None):
+        if not self._loading: #Nothing may be depending on a spreadsheet still being built
+            self._invalidate(cell)
+
+    def _invalidate(self, cell=None):
+        """
+        Discards calculated values depending on cell, in this spreadsheet or in any other of the workbook
+        :param cell: Cell changed. None if any may have changed
+        :return: None
+        """
+        self._generation += 1
+        self._discard(None if cell is None or self.id is None else id(cell))
+        if self.id is not None:
+            self.workbook._invalidate(self, None if cell is None else cell.coordinates)
+
+    def _discard(self, key=None):
+        """
+        Discards a calculated value, either already calculated or being calculated
+        :param key: id of the cell. None to discard all of them
+        :return: None
+        """
+        for calculated in (self._calculated, self._calculating):
+            if calculated is not None:
+                if key is None:
+                    calculated.clear()
+                else:
+                    calculated.pop(key, None)
+
+    def _get_lock(self):
+        loop = asyncio.get_running_loop()
+        if self._lock[0] is not loop: #Locks cannot be shared between event loops
+            self._lock = (loop, asyncio.Lock())
+        return self._lock[1]
+
+    async def _acalculate(self, chunk_size, executor):
+        """
+        Calculates every formula in the spreadsheet by chunks of rows, yielding to the event loop between them.
+        Values discarded by edits meanwhile are calculated again, up to Spreadsheet.retries times.
+        Those still left are calculated when read.
+        :param chunk_size: rows to calculate before yielding to the event loop
+        :param executor: ThreadPoolExecutor to calculate in. None to calculate in the event loop
+        :return: None
+        """
+        _check_executor(executor)
+        loop = asyncio.get_running_loop()
+        self._calculating = calculating = dict()
+        try:
+            for retry in range(Spreadsheet.retries+1):
+                rows = [[cell for cell in row
+                         if isinstance(object.__getattribute__(cell, "_value"), (_RelativeCell, dict))
+                         and id(cell) not in calculating]
+                        for row in list.__iter__(self)]
+                rows = [row for row in rows if len(row) > 0]
+                if len(rows) == 0:
+                    break
+                for offset in range(0, len(rows), chunk_size):
+                    chunk = rows[offset:offset+chunk_size]
+                    if executor is None:
+                        calculating.update(_calculate_rows(chunk, offset))
+                    else:
+                        generation = self._generation
+                        calculated = await loop.run_in_executor(executor, _calculate_rows, chunk, offset)
+                        if generation == self._generation: #Otherwise, it may have been calculated from old values
+                            calculating.update(calculated)
+                    await asyncio.sleep(0)
+        finally:
+            self._calculating = None
+        self._calculated = calculating
+
+    async def arecalculate(self, *, chunk_size=100, executor=None):
+        """
+        Calculates every formula in the spreadsheet without blocking the event loop.
+        Readers keep on getting the former values until all of them are calculated.
+        :param chunk_size: rows to calculate before yielding to the event loop
+        :param executor: ThreadPoolExecutor to calculate in, keeping the event loop responsive. None to calculate in the event loop
+        :return: None
+        """
+        async with self._get_lock():
+            await self._acalculate(chunk_size, executor)
+
+    async def ato_sylk(self, stream, *, chunk_size=100, executor=None, encoding=None):
+        """
+        Writes the sylk representation of the spreadsheet to stream without blocking the event loop.
+        Formulas are calculated first, and the values are then taken all at once to be rendered.
+        :param stream: text stream, or stream with awaitable write or drain methods
+        :param chunk_size: rows to render before yielding to the event loop
+        :param executor: ThreadPoolExecutor to render in, keeping the event loop responsive. None to render in the event loop
+        :param encoding: encoding to write with if stream takes bytes
+        :return: None
+        """
+        async with self._get_lock():
+            await self._acalculate(chunk_size, executor)
+            rows = [[_snapshot(cell) for cell in row] for row in list.__iter__(self)]
+        data = await _amap(_sylk_rows, rows, chunk_size, executor)
+        await _awrite(stream, "\r\n".join(SYLK_HEAD)+"\r\n", encoding)
+        for chunk in data:
+            await _awrite(stream, chunk, encoding)
+        await _awrite(stream, "E\r\n", encoding)
+
+    async def ato_csv(self, stream, *, chunk_size=100, executor=None, encoding=None, **fmtparams):
+        """
+        Writes the values of the spreadsheet as csv to stream without blocking the event loop.
+        Formulas are calculated first, and the values are then taken all at once.
+        :param stream: text stream, or stream with awaitable write or drain methods
+        :param chunk_size: rows to calculate before yielding to the event loop
+        :param executor: ThreadPoolExecutor to calculate in, keeping the event loop responsive. None to calculate in the event loop
+        :param encoding: encoding to write with if stream takes bytes
+        :param fmtparams: formatting parameters for csv.writer
+        :return: None
+        """
+        async with self._get_lock():
+            await self._acalculate(chunk_size, executor)
+            rows = [[cell.value for cell in row] for row in list.__iter__(self)]
+        for offset in range(0, len(rows), chunk_size):
+            text = io.StringIO()
+            csv.writer(text, **fmtparams).writerows(rows[offset:offset+chunk_size])
+            await _awrite(stream, text.getvalue(), encoding)
+            await asyncio.sleep(0)
+
+    async def aread_csv(self, stream, *, chunk_size=100, encoding=None, **fmtparams):
+        """
+        Appends the rows of a csv stream to the spreadsheet, yielding to the event loop between chunks.
+        Values are kept as they are, so fields beginning with "=" are not taken for formulas.
+        Other asynchronous operations on the spreadsheet wait until the whole stream is read.
+        :param stream: text stream or asynchronous iterable of lines
+        :param chunk_size: lines to read before appending them and yielding to the event loop
+        :param encoding: encoding to decode lines with if stream gives bytes
+        :param fmtparams: formatting parameters for csv.reader
+        :return: None
+        """
+        quotechar = csv.reader([], **fmtparams).dialect.quotechar
+        async with self._get_lock():
+            lines = list()
+            quotes = 0
+            async for line in _alines(stream):
+                if encoding is not None:
+                    line = line.decode(encoding)
+                lines.append(line)
+                if quotechar is not None:
+                    quotes += line.count(quotechar)
+                if len(lines) >= chunk_size and quotes % 2 == 0: #Not in the middle of a quoted field
+                    self._extend_values(csv.reader(lines, **fmtparams))
+                    lines = list()
+                    quotes = 0
+                    await asyncio.sleep(0)
+            self._extend_values(csv.reader(lines, **fmtparams))
+
+    def _extend_values(self, items):
+        """
+        Extends the spreadsheet with rows of plain values, without verifying them
+        :param items: rows of values as read from csv
+        :return: None
+        """
+        for item in items:
+            row = Rows(self)
+            list.append(self, row)
+            for value in item:
+                list.append(row, Cell(self, _csv_value(value)))
+        self._touch()
+
 class Columns(Spreadsheet):
     """
     Column Class to Spreadsheet
@@ -381,6 +839,7 @@ class Rows(list):
             data = verify(value, self[key])
             if isinstance(data, Cell):
                 list.__setitem__(self, x, data)
+                self.spreadsheet._touch()
             else:
                 self[key].value = verify(value, self[key])
         elif isinstance(key, slice):
@@ -391,6 +850,7 @@ class Rows(list):
                         data = verify(value[index], self[x])
                         if isinstance(data, Cell):
                             list.__setitem__(self, x, data)
+                            self.spreadsheet._touch()
                         else:
                             self[x].value = verify(value[index], self[x])
                 else:
@@ -416,6 +876,7 @@ class Rows(list):
             data = verify(i, self[-1])
             if isinstance(data, Cell):
                 list.__setitem__(self, -1, data)
+                self.spreadsheet._touch()
             else:
                 self[-1].value = verify(i, self[-1])
 
@@ -425,6 +886,44 @@ class Rows(list):
         else:
             TypeError("values may be a list or a tuple")
 
+    def __delitem__(self, key):
+        list.__delitem__(self, key)
+        self.spreadsheet._touch()
+
+    def clear(self):
+        list.clear(self)
+        self.spreadsheet._touch()
+
+    def insert(self, index, item):
+        list.insert(self, index, item)
+        self.spreadsheet._touch()
+
+    def pop(self, index=-1):
+        item = list.pop(self, index)
+        self.spreadsheet._touch()
+        return item
+
+    def remove(self, item):
+        list.remove(self, item)
+        self.spreadsheet._touch()
+
+    def reverse(self):
+        list.reverse(self)
+        self.spreadsheet._touch()
+
+    def sort(self, *, key=None, reverse=False):
+        list.sort(self, key=key, reverse=reverse)
+        self.spreadsheet._touch()
+
+    def __iadd__(self, items):
+        self.extend(items)
+        return self
+
+    def __imul__(self, times):
+        list.__imul__(self, times)
+        self.spreadsheet._touch()
+        return self
+
     def index(self, value):
         for index, item in enumerate(self):
             if item == value:
@@ -432,6 +931,33 @@ class Rows(list):
         else:
             raise ValueError
 
+def sylk_cell(value, coordinates):
+    """
+    Gives the sylk representation of a raw cell value at the given coordinates
+    :param value: raw value stored in the cell
+    :param coordinates: slice with the form [column:row] of the cell
+    :return: sylk representation of the cell
+    """
+    if isinstance(value, _RelativeCell):
+        coords = sum_slices(coordinates, value.coordinates)
+        value = "ER{}C{}".format(coords.stop+1, coords.start+1)
+    elif isinstance(value, dict) and "calculated" in value:
+        value = value["function"]._sylk(value["calculated"])
+    elif isinstance(value, dict) and "function" in value:
+        value = sylk(value["function"])
+    else:
+        value = sylk(value)
+    if not value.startswith("E"):
+        value = "K"+value
+    start, stop = coordinates.start, coordinates.stop
+    if ";E" in value:
+        ov = value
+        value = re.sub(r"R([0-9]+)", lambda x: "R["+str(int(x.group(0)[1:])-stop-1)+"]", value)
+        value = re.sub(r"C([0-9]+)", lambda x: "C["+str(int(x.group(0)[1:])-start-1)+"]", value)
+        if ov != value:
+            value = value.replace("[0]", "")
+    return "C;Y{};X{};{}".format(stop+1, start+1, value.upper())
+
 class Cell:
     """
     Cell Class to Spreadsheet
@@ -463,26 +989,7 @@ class Cell:
             self.value == other
 
     def __sylk__(self):
-        value = object.__getattribute__(self, "_value")
-        if isinstance(value, _Relatives):
-            coords = value(self).coordinates
-            value = "ER{}C{}".format(coords.stop+1, coords.start+1)
-        elif isinstance(value, dict) and "sylk" in value:
-            value = value["sylk"]
-        else:
-            value = sylk(value)
-        if not value.startswith("E"):
-            value = "K"+value
-        start, stop = self.coordinates.start, self.coordinates.stop
-        if ";E" in value:
-            ov = value
-            value = re.sub(r"R([0-9]+)", lambda x: "R["+str(int(x.group(0)[1:])-stop-1)+"]", value)
-            value = re.sub(r"C([0-9]+)", lambda x: "C["+str(int(x.group(0)[1:])-start-1)+"]", value)
-            if ov != value:
-                value = value.replace("[0]", "")
-        return "C;Y{};X{};{}".format(stop+1, start+1, value.upper())
-        #if isinstance(value, dict) and "sylk" in value:
-        #    return value["sylk"]
+        return sylk_cell(object.__getattribute__(self, "_value"), self.coordinates)
 
     @property
     def coordinates(self):
@@ -509,20 +1016,39 @@ class Cell:
     @property
     def value(self):
         to_return = object.__getattribute__(self, "_value")
+        if isinstance(to_return, (_RelativeCell, dict)):
+            calculated = self.spreadsheet._calculated
+            if calculated is not None:
+                cell, value = calculated.get(id(self), (None, None))
+                if cell is self:
+                    return value
         if isinstance(to_return, _RelativeCell):
             return object.__getattribute__(to_return(self), "_value")
-        elif all([isinstance(to_return, typo) for typo in (Cell, dict)]):
-            return eval(object.__getattribute__(to_return, "_value")["eval"])
-        elif isinstance(to_return, dict) and "repr" in to_return:
-            return eval(str(eval(to_return["repr"])))
+        elif isinstance(to_return, dict) and "function" in to_return:
+            return to_return["function"]()
         else:
             return to_return
 
     @value.setter
     def value(self, value):
         object.__setattr__(self, "_value", value)
+        if self.spreadsheet.id is not None:
+            self.spreadsheet.workbook._depend(self)
+        self.spreadsheet._touch(self)
 
 
+def get_values(item):
+    """
+    Gives the values of the cells in item
+    :param item: Cell, or list of them, as nested as needed
+    :return: value or list of values with the same nesting
+    """
+    if isinstance(item, Cell):
+        return item.value
+    elif isinstance(item, (list, tuple)):
+        return [get_values(i) for i in item]
+    return item
+
 class Function:
     """
     Function Class for Cells
@@ -534,43 +1060,37 @@ class Function:
     def function(self):
        return self._function
 
-    def __call__(self, args, _sheetname, **kwargs):
+    def __call__(self, args, _spreadsheet, **kwargs):
         class callable:
-            def __init__(self, function, args, *, _sheetname, **kwargs):
+            def __init__(self, function, args, *, _spreadsheet, **kwargs):
                 self.function = function
-                self._args = args.split(";") #arguments in function may be separated by semicolons
                 self.kwargs = kwargs
-                self.spreadsheet = Spreadsheet.sheets[str(_sheetname)]
-                self.sheetname = _sheetname
-
-            @property
-            def args(self):
-                final = list()
-                for arg in self._args:
+                self.spreadsheet = _spreadsheet
+                self._args = list()
+                for arg in args.split(";"): #arguments in function may be separated by semicolons
                     arg = arg.lower()
-                    data = re.findall(r"^([\W\w]+!)?([a-z]+[0-9]+(?::[a-z]+[0-9]+)?)$", arg)
-                    if len(data) == 1:
+                    data = re.findall(r"^(?:([\W\w]+)!)?([a-z]+[0-9]+(?::[a-z]+[0-9]+)?|[a-z]+:[a-z]+|[0-9]+:[0-9]+)$",
+                                      arg)
+                    if len(data) == 1: #References are bound to their spreadsheets once
                         sheetname, cell = data[0]
-                        if cell != "":
-                            sheetname = sheetname != "" and sheetname or self.sheetname
-                        final.append(Spreadsheet.sheets[str(sheetname)].range(cell))
-                    else:
-                        data = re.findall(r"^([\W\w]+!)?([a-z]+:[a-z]+)$", arg)
-                        if len(data) == 1:
-                            sheetname, cell = data[0]
-                            if cell != "":
-                                sheetname = sheetname != "" and sheetname or self.sheetname
-                            final.append(Spreadsheet.sheets[str(sheetname)].range(cell))
+                        if sheetname != "":
+                            self._args.append((self.spreadsheet.workbook[sheetname], cell))
                         else:
-                            data = re.findall(r"^([\W\w]+!)?([0-9]+:[0-9]+)$", arg)
-                            if len(data) == 1:
-                                sheetname, cell = data[0]
-                                if cell != "":
-                                    sheetname = sheetname != "" and sheetname or self.sheetname
-                                final.append(Spreadsheet.sheets[str(sheetname)].range(cell))
-                            else:
-                                final.append(arg)
-                return final
+                            self._args.append((self.spreadsheet, cell))
+                    else:
+                        self._args.append((None, arg))
+
+            @property
+            def args(self):
+                return [arg if sheet is None else sheet.range(arg) for sheet, arg in self._args]
+
+            @property
+            def references(self):
+                return [(sheet, get_bounds_by_name(arg)) for sheet, arg in self._args if sheet is not None]
+
+            def __call__(self):
+                return getattr(Functions, self.function)(*get_values(self.args),
+                                                         **{key: get_values(self.kwargs[key]) for key in self.kwargs})
 
             def __repr__(self):
                 return "Functions.{function}({args})".format(function = self.function,
@@ -579,12 +1099,15 @@ class Function:
                                                                                 for key in self.kwargs]))
 
             def __sylk__(self):
-                return "{};E{function}({args})".format(eval(str(self.__repr__())),
+                return self._sylk(self())
+
+            def _sylk(self, value):
+                return "{};E{function}({args})".format(value,
                                                         function = self.function, #TODO Verify semicolon in args
                                                         args = "; ".join([sylk(arg) for arg in self.args]+
                                                                          [key+"="+sylk(self.kwargs[key])
                                                                           for key in self.kwargs]))
-        return callable(self.function, args, _sheetname=_sheetname, **kwargs)
+        return callable(self.function, args, _spreadsheet=_spreadsheet, **kwargs)
 
     def __sylk__(self):
         pass
@@ -596,10 +1119,9 @@ class Function:
 def verify(value, cell):
     coords = cell.coordinates
     spreadsheet = cell.spreadsheet
-    sheetname = spreadsheet.name
     if isinstance(value, Cell):
         start = value.coordinates
-        if value.spreadsheet.name == sheetname:
+        if value.spreadsheet is spreadsheet:
             return RelativeCell.__getitem__(sub_slices(start, coords))
         else:
             return value
@@ -623,14 +1145,12 @@ def verify(value, cell):
                 #              lambda x: "{}_sheetname={}).__repr__()".format(x.group(0)[-1], sheetname),
                 #              value)
                 #print(repr)
-                repr = value.replace("(", "(\"\"\"").replace(")", "\"\"\", _sheetname={})".format(sheetname))
-                new_value["repr"] = repr
+                repr = value.replace("(", "(\"\"\"").replace(")", "\"\"\", _spreadsheet=spreadsheet)")
                 #new_value["sylk"] = re.sub(r"Spreadsheet.functions\[[\w\W]+]\]\([\w\W]+\)",
                 #                           lambda x: "sylk("+x.group(0)+")",
                 #                           value)
-                new_value["sylk"] = sylk(eval(repr))
                 try:
-                    new_value["eval"] = str(eval(repr))
+                    new_value["function"] = eval(repr) #Compiled once, with its references bound
                 except SyntaxError:
                     raise SyntaxError(value)
                 return new_value
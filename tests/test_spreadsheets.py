@@ -0,0 +1,271 @@
+import asyncio
+import io
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from .. import Spreadsheet, Workbook
+
+
+def values(spreadsheet):
+    return [[cell.value for cell in row] for row in spreadsheet]
+
+
+def sample():
+    return Spreadsheet([["a", "b"], [1, 2], [3, 4], ["=sum(A2:A3)", "=sum(B2:B3)", "=A2"]])
+
+
+def test_ato_sylk_equals_sylk():
+    spreadsheet = sample()
+    stream = io.StringIO()
+    asyncio.run(spreadsheet.ato_sylk(stream, chunk_size=1))
+    assert stream.getvalue() == spreadsheet.__sylk__()
+
+
+def test_ato_sylk_in_thread_executor():
+    spreadsheet = sample()
+    stream = io.StringIO()
+    with ThreadPoolExecutor() as executor:
+        asyncio.run(spreadsheet.ato_sylk(stream, chunk_size=2, executor=executor))
+    assert stream.getvalue() == spreadsheet.__sylk__()
+
+
+def test_ato_sylk_after_edit():
+    spreadsheet = Spreadsheet([[1], [2], ["=sum(A1:A2)"]])
+    spreadsheet["A1"] = 100
+    stream = io.StringIO()
+    asyncio.run(spreadsheet.ato_sylk(stream))
+    assert "C;Y3;X1;K102;ESUM(R[-2]C:R[-1]C)" in stream.getvalue()
+    assert stream.getvalue() == spreadsheet.__sylk__()
+
+
+def test_process_executor_rejected():
+    with ProcessPoolExecutor() as executor:
+        with pytest.raises(TypeError):
+            asyncio.run(sample().ato_sylk(io.StringIO(), executor=executor))
+
+
+def test_used_from_several_event_loops():
+    spreadsheet = sample()
+
+    async def main():
+        await asyncio.gather(spreadsheet.arecalculate(chunk_size=1), spreadsheet.ato_csv(io.StringIO(), chunk_size=1))
+
+    asyncio.run(main())
+    asyncio.run(main())
+
+
+def test_csv_round_trip():
+    stream = io.StringIO()
+    asyncio.run(sample().ato_csv(stream, chunk_size=1))
+    assert stream.getvalue() == "a,b\r\n1,2\r\n3,4\r\n4,6,1\r\n"
+    spreadsheet = Spreadsheet()
+    asyncio.run(spreadsheet.aread_csv(io.StringIO(stream.getvalue()), chunk_size=1))
+    assert values(spreadsheet) == [["a", "b"], [1, 2], [3, 4], [4, 6, 1]]
+
+
+def test_aread_csv_keeps_formulas_as_text():
+    spreadsheet = Spreadsheet()
+    asyncio.run(spreadsheet.aread_csv(io.StringIO("a,b\n=x,3\n")))
+    assert spreadsheet["A2"].value == "=x"
+
+
+def test_aread_csv_converts_only_plain_numbers():
+    spreadsheet = Spreadsheet()
+    asyncio.run(spreadsheet.aread_csv(io.StringIO("nan,inf,Infinity,007,1_000, 12 ,-3,0,2.5,-1.5e3,\n")))
+    assert values(spreadsheet) == [["nan", "inf", "Infinity", "007", "1_000", " 12 ", -3, 0, 2.5, -1500.0, None]]
+
+
+def test_aread_csv_async_stream_with_quoted_newline():
+    async def lines():
+        for line in ['a,"multi\n', 'line",2\n', "1,2.5\n"]:
+            yield line
+
+    spreadsheet = Spreadsheet()
+    asyncio.run(spreadsheet.aread_csv(lines(), chunk_size=1))
+    assert values(spreadsheet) == [["a", "multi\nline", 2], [1, 2.5]]
+
+
+def test_arecalculate_keeps_values_until_edited():
+    spreadsheet = sample()
+    asyncio.run(spreadsheet.arecalculate())
+    assert spreadsheet["A4"].value == 4
+    spreadsheet["A2"] = 10
+    assert spreadsheet["A4"].value == 13
+
+
+def test_arecalculate_under_edits_keeps_only_current_values():
+    spreadsheet = Spreadsheet([[index, "=sum(A1:A{})".format(index+1), "=sum(B{})".format(index+1)]
+                               for index in range(20)])
+
+    async def main():
+        stop = asyncio.Event()
+
+        async def writer():
+            count = 0
+            while not stop.is_set():
+                spreadsheet[count % 20][0] = count
+                count += 1
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(writer())
+        with ThreadPoolExecutor() as executor:
+            await spreadsheet.arecalculate(chunk_size=1, executor=executor)
+        stop.set()
+        await task
+
+    asyncio.run(main())
+    for cell, value in spreadsheet._calculated.values():
+        assert value == object.__getattribute__(cell, "_value")["function"]()
+
+
+def test_list_mutations_discard_calculated_values():
+    spreadsheet = Spreadsheet([[1], [2], [5], ["=sum(A1:A2)"]])
+    asyncio.run(spreadsheet.arecalculate())
+    del spreadsheet[0]
+    assert spreadsheet[2][0].value == 7
+    asyncio.run(spreadsheet.arecalculate())
+    spreadsheet[1].pop()
+    spreadsheet[1].append(9)
+    assert spreadsheet[2][0].value == 11
+
+
+def test_sort_discards_calculated_values():
+    spreadsheet = Spreadsheet([[1, "=sum(A2)"], [2, 0]])
+    asyncio.run(spreadsheet.arecalculate())
+    assert spreadsheet["B1"].value == 2
+    spreadsheet.sort(key=lambda row: -row[0].value)
+    assert spreadsheet["B2"].value == 1
+
+
+def test_other_mutations_discard_calculated_values():
+    spreadsheet = Spreadsheet([[1], [2], ["=sum(A1:A2)"]])
+    asyncio.run(spreadsheet.arecalculate())
+    spreadsheet[0] = [5]
+    assert spreadsheet["A3"].value == 7
+    asyncio.run(spreadsheet.arecalculate())
+    spreadsheet[0] += [1]
+    spreadsheet[0] *= 1
+    spreadsheet += [[4]]
+    assert spreadsheet["A3"].value == 7
+    assert values(spreadsheet) == [[5, 1], [2], [7], [4]]
+
+
+def test_exports_finish_under_constant_edits():
+    spreadsheet = Spreadsheet([[index] for index in range(10)] + [["=sum(A1:A10)"]])
+
+    async def main():
+        stop = asyncio.Event()
+
+        async def writer():
+            count = 0
+            while not stop.is_set():
+                spreadsheet[0][0] = count
+                count += 1
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(writer())
+        await asyncio.wait_for(spreadsheet.ato_sylk(io.StringIO(), chunk_size=2), 1)
+        await asyncio.wait_for(spreadsheet.ato_csv(io.StringIO(), chunk_size=2), 1)
+        await asyncio.wait_for(spreadsheet.arecalculate(chunk_size=2), 1)
+        stop.set()
+        await task
+
+    asyncio.run(main())
+
+
+def calculated(spreadsheet):
+    return sorted([value for cell, value in spreadsheet._calculated.values()])
+
+
+def test_invalidation_across_sheets():
+    workbook = Workbook()
+    data = workbook.add([[1, 2], [3, 4]], name="Data")
+    totals = workbook.add([["=sum(data!A1:B2)", "=max(A:A)", "=min(data!A2)", 7, "=sum(D1)"]], name="Totals")
+    other = workbook.add([["=sum(totals!A1)", "=sum(totals!D1)"]])
+    for spreadsheet in (data, totals, other):
+        asyncio.run(spreadsheet.arecalculate())
+    data["A1"] = 100
+    assert calculated(totals) == [3, 7]
+    assert calculated(other) == [7]
+    assert values(totals) == [[109, 109, 3, 7, 7]]
+    assert values(other) == [[109, 7]]
+
+
+def test_overwritten_formula_stops_depending():
+    workbook = Workbook()
+    data = workbook.add([[1, 2]], name="Data")
+    totals = workbook.add([["=sum(data!A1:B1)"]])
+    assert len(workbook._dependents[data.id]) == 1
+    totals["A1"] = 5
+    assert len(workbook._dependents[data.id]) == 0
+
+
+def test_references_survive_renames():
+    workbook = Workbook()
+    data = workbook.add([[1, 2]], name="Data")
+    totals = workbook.add([["=sum(data!A1:B1)"]])
+    data.name = "Renamed"
+    assert workbook["renamed"] is data
+    assert "data" not in workbook
+    assert totals["A1"].value == 3
+
+
+def test_slices_do_not_register_or_rename_sheets():
+    workbook = Workbook()
+    first = workbook.add([[1, 2], [3, 4]])
+    first["A:B"]
+    first["1:2"]
+    second = workbook.add([[5]])
+    assert (first.id, first.name, second.id, second.name) == (0, "0", 1, "1")
+    assert [spreadsheet.id for spreadsheet in workbook] == [0, 1]
+
+
+def test_non_string_names():
+    workbook = Workbook()
+    spreadsheet = workbook.add([[1]], name=5)
+    assert workbook["5"] is spreadsheet
+
+
+def test_workbook_keeps_its_spreadsheets():
+    workbook = Workbook()
+    workbook.add([[1, 2]], name="Data")
+    assert len(workbook) == 1
+    assert workbook["data"].name == "Data"
+    totals = workbook.add([["=sum(data!A1:B1)"]])
+    assert totals["A1"].value == 3
+
+
+def test_workbook_remove():
+    workbook = Workbook()
+    data = workbook.add([[1, 2]], name="Data")
+    workbook.remove(data)
+    assert "data" not in workbook
+    assert len(workbook) == 0
+    data.name = "Other"
+    assert "other" not in workbook
+    with pytest.raises(ValueError):
+        workbook.remove(data)
+
+
+def test_names_are_unique():
+    workbook = Workbook()
+    first = workbook.add([[1]], name="X")
+    with pytest.raises(ValueError):
+        workbook.add([[2]], name="x")
+    second = workbook.add([[3]], name="Y")
+    with pytest.raises(ValueError):
+        second.name = "x"
+    assert second.name == "Y"
+    second.name = "y"
+    assert workbook["X"] is first
+    assert workbook["Y"] is second
+
+
+def test_integer_keys_are_names():
+    workbook = Workbook()
+    workbook.add([[1]])
+    spreadsheet = workbook.add([[2]], name=7)
+    assert workbook[7] is spreadsheet
+    assert workbook[0] is not spreadsheet
+    assert workbook.by_id(spreadsheet.id) is spreadsheet